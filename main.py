@@ -1,17 +1,192 @@
 #!/usr/bin/env python3
 
 import os
+import re
+import sys
+import time
+import copy
 import asyncio
+import functools
+import contextlib
+import importlib.util
+import itertools
+import math
+import random
 import json
 import subprocess
 import logging
+import sqlite3
+import zlib
+import httpx
 import yaml
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+from collections import OrderedDict, deque
+from pathlib import Path
+from types import MappingProxyType
+from typing import Final, List, Dict, Any, Optional
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, RateLimitError
 from openai.types.beta.threads import Run
 from openai.types.beta.assistant import Assistant
 from openai.types.beta.thread import Thread
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML未编译libyaml绑定时使用纯Python实现
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时退回标准库json
+    orjson = None
+
+
+def _json_dumps_bytes(obj, sort_keys=False) -> bytes:
+    """序列化为UTF-8字节，优先使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys).encode()
+
+
+def write_json(obj, stream=None):
+    """以缩进2格的JSON输出详细结果
+    
+    orjson生成的UTF-8字节直接写入底层二进制缓冲区，不再解码成字符串；
+    未安装orjson时由json.dump分块写入，避免先拼出完整字符串。
+    """
+    stream = stream or sys.stdout
+    stream.flush()
+    buffer = getattr(stream, "buffer", None)
+    if orjson is not None and buffer is not None:
+        buffer.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+        buffer.flush()
+        return
+    json.dump(obj, stream, ensure_ascii=False, indent=2)
+    stream.write("\n")
+    stream.flush()
+
+
+def _json_loads(data):
+    """解析JSON字符串或字节，优先使用orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+# LinkedIn公司页面URL匹配
+_LINKEDIN_COMPANY_RE = re.compile(r"linkedin\.com/company/", re.IGNORECASE)
+
+# 工具列表的磁盘缓存，跨进程复用，超过TTL后重新获取
+_TOOLS_CACHE_PATH = Path(os.path.expanduser("~/.cache/search-linkedin-mcp/tools.json"))
+_TOOLS_CACHE_TTL = 24 * 3600  # 秒
+
+# 验证结果的磁盘缓存（SQLite），开发时重复运行相同公司可跳过MCP和OpenAI调用
+_VERIFY_CACHE_PATH = _TOOLS_CACHE_PATH.with_name("verify.sqlite3")
+_VERIFY_CACHE_TTL = 24 * 3600  # 秒
+
+# 每次从MCP服务器stdout读取的最大字节数
+_READ_CHUNK_SIZE = 65536
+
+# 共享HTTP连接池大小，并发验证和工具调用时复用已建立的连接
+_HTTP_MAX_CONNECTIONS = 200
+_HTTP_MAX_KEEPALIVE_CONNECTIONS = 50
+
+# 安装了h2时启用HTTP/2，并发请求可复用同一条TCP连接
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# run_thread轮询运行状态的退避参数（秒）
+_POLL_INITIAL_DELAY = 0.1
+_POLL_BACKOFF = 1.6
+_POLL_MAX_DELAY = 2.0
+
+# 请求超时时间（秒）：协议请求使用默认值，工具调用按各自的耗时设置
+_DEFAULT_TIMEOUT = 30
+_TOOL_TIMEOUTS = MappingProxyType({
+    "search_company": 15,
+    "crawl_multiple_pages": 120,
+    "verify_multiple_contents": 60,
+})
+
+# OpenAI限流：只设置其中一个环境变量时另一个使用的默认值，以及429时的最大尝试次数
+_DEFAULT_MAX_REQUESTS_PER_MINUTE = 500
+_DEFAULT_MAX_TOKENS_PER_MINUTE = 30000
+_RATE_LIMIT_MAX_ATTEMPTS = 5
+# 一次直接验证大致消耗的token数（验证所用的LLM调用发生在MCP服务器中，只能估算）
+_VERIFY_TOKEN_ESTIMATE = 4000
+
+# 保留最近的stderr输出用于诊断：最多16块，每块1KB
+_STDERR_CHUNK_SIZE = 1024
+_STDERR_MAX_CHUNKS = 16
+
+# 助手的静态指令，每次运行都保持逐字节一致，以便命中OpenAI的提示前缀缓存；
+# 公司名称等动态内容只放在用户消息中
+_STATIC_INSTRUCTIONS: Final[str] = (
+    "你是一个帮助验证公司信息的AI助手，可以搜索、提取和验证公司信息。你有以下工具可用：\n"
+    "1. search_company: 搜索公司信息\n"
+    "2. crawl_multiple_pages: 爬取多个LinkedIn页面\n"
+    "3. verify_multiple_contents: 验证页面内容是否匹配公司"
+)
+
+# 交互模式中发给助手的用户消息模板，只替换公司名称和官方网站
+_VERIFY_PROMPT_TEMPLATE: Final[str] = "请帮我验证公司 '{company}' 的信息"
+_WEBSITE_PROMPT_TEMPLATE: Final[str] = "，官方网站是 {website}"
+
+# 各MCP工具在OpenAI函数调用中的参数定义，只读以免被意外修改
+_TOOL_SCHEMAS = MappingProxyType({
+    "search_company": {
+        "type": "object",
+        "properties": {
+            "company_name": {
+                "type": "string",
+                "description": "要搜索的公司名称"
+            }
+        },
+        "required": ["company_name"]
+    },
+    "crawl_multiple_pages": {
+        "type": "object",
+        "properties": {
+            "urls": {
+                "type": "array",
+                "items": {
+                    "type": "string"
+                },
+                "description": "要爬取的URL列表"
+            }
+        },
+        "required": ["urls"]
+    },
+    "verify_multiple_contents": {
+        "type": "object",
+        "properties": {
+            "company_name": {
+                "type": "string",
+                "description": "公司名称"
+            },
+            "pages": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "url": {
+                            "type": "string"
+                        },
+                        "content": {
+                            "type": "string"
+                        }
+                    }
+                },
+                "description": "要验证的页面内容列表"
+            },
+            "official_website": {
+                "type": "string",
+                "description": "公司官方网站（可选）"
+            }
+        },
+        "required": ["company_name", "pages"]
+    },
+})
+
 # 由于openai.types.mcp.server导入问题，我们创建自己的MCPServerStdio实现
 class MCPServerStdio:
     """MCP服务器通过stdio通信的实现"""
@@ -29,8 +204,14 @@ class MCPServerStdio:
         self.process = None
         self.cache_tools_list = cache_tools_list
         self._tools_cache = None
-        self._next_request_id = 1
+        self._request_ids = itertools.count(1)  # JSON-RPC请求id生成器
         self._initialized = False
+        self._pending = {}  # 请求id -> 等待响应的Future
+        self._write_lock = asyncio.Lock()
+        self._reader_task = None
+        self._rxbuf = bytearray()  # 尚未凑成完整消息的输出字节
+        self._stderr_task = None
+        self._stderr_buf = deque(maxlen=_STDERR_MAX_CHUNKS)
     
     async def __aenter__(self):
         """启动服务器进程"""
@@ -43,6 +224,11 @@ class MCPServerStdio:
             env=self.env  # 传递环境变量给子进程
         )
         
+        # 后台读取响应，按id分发给等待中的请求
+        self._reader_task = asyncio.create_task(self._read_loop())
+        # 持续读取错误输出，避免子进程因stderr管道写满而阻塞
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+        
         # 发送初始化请求
         await self._initialize()
         
@@ -50,6 +236,17 @@ class MCPServerStdio:
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """关闭服务器进程"""
+        for task in (self._reader_task, self._stderr_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._reader_task = None
+        self._stderr_task = None
+        self._fail_pending(RuntimeError("MCP服务器连接已关闭"))
+        
         if self.process:
             try:
                 self.process.terminate()
@@ -66,7 +263,6 @@ class MCPServerStdio:
         # 初始化请求
         init_request = {
             "jsonrpc": "2.0",
-            "id": self._next_request_id,
             "method": "initialize",
             "params": {
                 "protocolVersion": "0.5.0",
@@ -79,7 +275,6 @@ class MCPServerStdio:
                 }
             }
         }
-        self._next_request_id += 1
         
         # 发送初始化请求
         init_result = await self._send_request(init_request)
@@ -87,90 +282,274 @@ class MCPServerStdio:
         
         return init_result
     
-    async def _send_request(self, request):
-        """向MCP服务器发送请求"""
+    async def _send_request(self, request, timeout=_DEFAULT_TIMEOUT):
+        """向MCP服务器发送单个请求，并等待对应id的响应"""
+        results = await self._send_batch([request], timeout)
+        return results[0]
+    
+    async def _send_batch(self, requests, timeout=_DEFAULT_TIMEOUT, return_exceptions=False):
+        """一次写入多个请求，按id收集各自的响应
+        
+        MCP的stdio传输按行解析消息且不接受JSON数组，
+        因此每个请求仍是独立的一行，但所有行只经过一次write+drain。
+        
+        Args:
+            requests: JSON-RPC请求列表（id由本方法分配）
+            timeout: 等待全部响应的超时时间（秒）
+            return_exceptions: 为True时单个请求的错误或超时作为异常对象返回，不中断整批
+            
+        Returns:
+            与requests顺序一致的结果列表
+        """
         if not self.process:
             raise RuntimeError("MCP服务器未启动")
         
-        request_json = json.dumps(request) + "\n"
-        self.process.stdin.write(request_json.encode())
-        await self.process.stdin.drain()
+        loop = asyncio.get_running_loop()
+        request_ids = []
+        futures = []
+        for request in requests:
+            request_id = next(self._request_ids)
+            request["id"] = request_id
+            future = loop.create_future()
+            self._pending[request_id] = future
+            request_ids.append(request_id)
+            futures.append(future)
         
-        # 读取响应
         try:
-            # 增加超时时间
-            timeout = 30  # 秒
-            response_line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+            payload = b"".join(_json_dumps_bytes(request) + b"\n" for request in requests)
+            # 加锁避免并发请求的字节交错写入
+            async with self._write_lock:
+                self.process.stdin.write(payload)
+                await self.process.stdin.drain()
             
-            if not response_line:
-                # 读取错误输出以便诊断
-                stderr_data = await self.process.stderr.read(1024)
-                if stderr_data:
-                    logging.error(f"MCP服务器错误输出: {stderr_data.decode()}")
-                raise Exception("空响应，可能是Node.js子进程没有输出")
-                
+            # 整批请求共用一个定时器，到期时让尚未完成的请求超时
+            timer = loop.call_later(timeout, self._expire_futures, futures)
             try:
-                response = json.loads(response_line.decode())
-            except json.JSONDecodeError as e:
-                logging.error(f"JSON解析错误: {e}")
-                logging.error(f"收到的原始响应: {response_line.decode()}")
-                raise Exception(f"无法解析JSON响应: {e}")
+                results = await asyncio.gather(*futures, return_exceptions=return_exceptions)
+            finally:
+                timer.cancel()
             
-            if "error" in response:
-                raise Exception(f"MCP服务器错误: {response['error']}")
-            
-            return response.get("result")
+            # 返回异常对象时，超时的请求同样换成统一的超时错误
+            timed_out = [i for i, result in enumerate(results) if isinstance(result, asyncio.TimeoutError)]
+            if timed_out:
+                self._log_timeout()
+                for i in timed_out:
+                    results[i] = Exception("等待MCP服务器响应超时")
+            return results
         except asyncio.TimeoutError:
-            logging.error(f"等待MCP服务器响应超时")
-            # 读取错误输出以便诊断
-            if self.process.stderr:
-                stderr_data = await self.process.stderr.read(1024)
-                if stderr_data:
-                    logging.error(f"服务器错误输出: {stderr_data.decode()}")
+            self._log_timeout()
             raise Exception("等待MCP服务器响应超时")
         except Exception as e:
             logging.error(f"MCP服务器通信错误: {e}")
-            if self.process.stderr:
-                stderr_data = await self.process.stderr.read(1024)
-                if stderr_data:
-                    logging.error(f"服务器错误输出: {stderr_data.decode()}")
             raise
+        finally:
+            for request_id in request_ids:
+                self._pending.pop(request_id, None)
+    
+    def _log_timeout(self):
+        """记录超时，并输出最近的错误输出以便诊断"""
+        logging.error(f"等待MCP服务器响应超时")
+        stderr_text = self._recent_stderr()
+        if stderr_text:
+            logging.error(f"服务器错误输出: {stderr_text}")
+    
+    @staticmethod
+    def _expire_futures(futures):
+        """让尚未完成的请求以超时结束"""
+        for future in futures:
+            if not future.done():
+                future.set_exception(asyncio.TimeoutError())
+    
+    async def _read_loop(self):
+        """持续读取服务器输出，按换行切分出完整消息后交给对应id的Future
+        
+        按块读取到接收缓冲区后直接从缓冲区视图解析，
+        避免readline的行缓冲复制和decode产生的临时字符串。
+        """
+        buffer = self._rxbuf
+        while True:
+            try:
+                data = await self.process.stdout.read(_READ_CHUNK_SIZE)
+            except Exception as e:
+                logging.error(f"读取MCP服务器输出失败: {e}")
+                self._fail_pending(Exception(f"读取MCP服务器输出失败: {e}"))
+                return
+            
+            if not data:
+                # 子进程已退出，稍等stderr读取完毕后输出以便诊断
+                if self._stderr_task:
+                    await asyncio.wait([self._stderr_task], timeout=0.1)
+                stderr_text = self._recent_stderr()
+                if stderr_text:
+                    logging.error(f"MCP服务器错误输出: {stderr_text}")
+                self._fail_pending(Exception("空响应，可能是Node.js子进程没有输出"))
+                return
+            
+            buffer += data
+            consumed = 0
+            with memoryview(buffer) as view:
+                while True:
+                    end = buffer.find(b"\n", consumed)
+                    if end < 0:
+                        break
+                    if end > consumed:
+                        try:
+                            self._dispatch_response(view[consumed:end])
+                        except (ValueError, TypeError) as e:
+                            # 单条异常消息不能让读取任务退出，否则之后的请求都只能等到超时
+                            logging.error(f"处理MCP服务器响应失败: {e}")
+                    consumed = end + 1
+            if consumed:
+                del buffer[:consumed]
+    
+    def _dispatch_response(self, frame):
+        """解析一条响应消息并完成对应的Future"""
+        try:
+            response = _json_loads(frame)
+        except ValueError as e:  # 包括JSONDecodeError和非UTF-8内容导致的UnicodeDecodeError
+            logging.error(f"JSON解析错误: {e}")
+            logging.error(f"收到的原始响应: {bytes(frame).decode(errors='replace')}")
+            return
+        
+        # 没有匹配id的消息（如服务器通知）直接忽略
+        if not isinstance(response, dict):
+            return
+        try:
+            future = self._pending.pop(response.get("id"), None)
+        except TypeError:
+            logging.warning(f"忽略id无效的响应: {response.get('id')!r}")
+            return
+        if future is None or future.done():
+            return
+        
+        if "error" in response:
+            future.set_exception(Exception(f"MCP服务器错误: {response['error']}"))
+        else:
+            future.set_result(response.get("result"))
+    
+    async def _drain_stderr(self):
+        """持续读取服务器错误输出，只保留最近的部分"""
+        while True:
+            chunk = await self.process.stderr.read(_STDERR_CHUNK_SIZE)
+            if not chunk:
+                return
+            self._stderr_buf.append(chunk)
+    
+    def _recent_stderr(self):
+        """返回最近的服务器错误输出"""
+        return b"".join(self._stderr_buf).decode(errors="replace")
+    
+    def _fail_pending(self, exc):
+        """让所有等待中的请求以异常结束"""
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
     
     async def list_tools(self):
         """获取可用工具列表"""
         if self.cache_tools_list and self._tools_cache:
             return self._tools_cache
         
+        if self.cache_tools_list:
+            cached = self._load_tools_cache()
+            if cached is not None:
+                self._tools_cache = cached
+                return cached
+        
         request = {
             "jsonrpc": "2.0",
-            "id": self._next_request_id,
             "method": "tools/list"
         }
-        self._next_request_id += 1
         
         result = await self._send_request(request)
         
         if self.cache_tools_list:
             self._tools_cache = result
+            self._save_tools_cache(result)
         
         return result
     
-    async def call_tool(self, tool_name, arguments):
-        """调用工具"""
+    async def ping(self):
+        """发送MCP ping请求，确认服务器仍能及时响应"""
         request = {
             "jsonrpc": "2.0",
-            "id": self._next_request_id,
-            "method": "tools/call",
-            "params": {
-                "name": tool_name,
-                "arguments": arguments
-            }
+            "method": "ping"
         }
-        self._next_request_id += 1
+        return await self._send_request(request)
+    
+    def _tools_cache_key(self):
+        """磁盘缓存的键：同一启动命令对应同一工具列表"""
+        return [self.command, list(self.args)]
+    
+    def _load_tools_cache(self):
+        """从磁盘读取未过期且键匹配的工具列表，不可用时返回None"""
+        try:
+            if time.time() - _TOOLS_CACHE_PATH.stat().st_mtime > _TOOLS_CACHE_TTL:
+                return None
+            data = _json_loads(_TOOLS_CACHE_PATH.read_bytes())
+            if data.get("key") == self._tools_cache_key():
+                return data.get("tools")
+        except (OSError, ValueError, AttributeError):
+            pass
+        return None
+    
+    def _save_tools_cache(self, tools):
+        """将工具列表原子写入磁盘缓存"""
+        try:
+            _TOOLS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = _TOOLS_CACHE_PATH.with_name(f"{_TOOLS_CACHE_PATH.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(_json_dumps_bytes({"key": self._tools_cache_key(), "tools": tools}))
+            os.replace(tmp_path, _TOOLS_CACHE_PATH)
+        except (OSError, TypeError) as e:
+            logging.warning(f"写入工具列表缓存失败: {e}")
+    
+    async def call_tool(self, tool_name, arguments, timeout=None):
+        """调用工具
         
-        result = await self._send_request(request)
+        Args:
+            tool_name: 工具名称
+            arguments: 工具参数
+            timeout: 超时时间（秒），默认按工具类型选择
+        """
+        results = await self.call_tools_batch([(tool_name, arguments)], timeout)
+        return results[0]
+    
+    async def call_tools_batch(self, calls, timeout=None, return_exceptions=False):
+        """在一次写入中批量调用多个互不依赖的工具
         
-        # 如果结果是文本内容的列表，提取文本
+        Args:
+            calls: (tool_name, arguments) 元组列表
+            timeout: 超时时间（秒），默认取这批工具中最长的超时时间
+            return_exceptions: 为True时单个调用的错误或超时作为异常对象返回，不影响其他调用
+            
+        Returns:
+            与calls顺序一致的工具结果列表
+        """
+        requests = [
+            {
+                "jsonrpc": "2.0",
+                "method": "tools/call",
+                "params": {
+                    "name": tool_name,
+                    "arguments": arguments
+                }
+            }
+            for tool_name, arguments in calls
+        ]
+        
+        if timeout is None:
+            timeout = max(_TOOL_TIMEOUTS.get(tool_name, _DEFAULT_TIMEOUT) for tool_name, _ in calls)
+        
+        results = await self._send_batch(requests, timeout, return_exceptions)
+        return [
+            result if isinstance(result, Exception) else self._extract_tool_result(result)
+            for result in results
+        ]
+    
+    @staticmethod
+    def _extract_tool_result(result):
+        """如果结果是文本内容的列表，提取并解析文本"""
         if isinstance(result, dict) and 'content' in result:
             content = result.get('content', [])
             if isinstance(content, list) and len(content) > 0:
@@ -179,15 +558,72 @@ class MCPServerStdio:
                         text = item.get('text', '')
                         if text:
                             try:
-                                return json.loads(text)
+                                return _json_loads(text)
                             except:
                                 return text
         
         return result
     
     def invalidate_tools_cache(self):
-        """使工具缓存失效"""
+        """使工具缓存（内存和磁盘）失效"""
         self._tools_cache = None
+        try:
+            _TOOLS_CACHE_PATH.unlink(missing_ok=True)
+        except OSError as e:
+            logging.warning(f"删除工具列表缓存失败: {e}")
+
+class MCPPool:
+    """MCP服务器进程池，让多个验证任务分别使用独立的服务器进程并行执行"""
+    
+    def __init__(self, params, size=4, cache_tools_list=True):
+        """初始化进程池
+        
+        Args:
+            params: 每个MCP服务器的启动参数，同MCPServerStdio
+            size: 服务器进程数量
+            cache_tools_list: 是否缓存工具列表
+        """
+        self.params = params
+        self.size = size
+        self.cache_tools_list = cache_tools_list
+        self._servers = []
+        self._queue = None
+    
+    async def __aenter__(self):
+        """并行启动所有服务器进程"""
+        self._queue = asyncio.Queue(maxsize=self.size)
+        servers = [MCPServerStdio(self.params, cache_tools_list=self.cache_tools_list) for _ in range(self.size)]
+        results = await asyncio.gather(*[server.__aenter__() for server in servers], return_exceptions=True)
+        
+        for server, result in zip(servers, results):
+            if isinstance(result, BaseException):
+                logging.error(f"MCP服务器进程启动失败: {result}")
+                await server.__aexit__(None, None, None)
+            else:
+                self._servers.append(server)
+                self._queue.put_nowait(server)
+        
+        if not self._servers:
+            raise RuntimeError("MCP服务器进程池启动失败")
+        
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """关闭所有服务器进程"""
+        servers, self._servers = self._servers, []
+        await asyncio.gather(
+            *[server.__aexit__(None, None, None) for server in servers],
+            return_exceptions=True
+        )
+    
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """取出一个空闲的服务器，使用完毕后自动归还"""
+        server = await self._queue.get()
+        try:
+            yield server
+        finally:
+            self._queue.put_nowait(server)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -196,13 +632,62 @@ logger = logging.getLogger(__name__)
 class CompanyVerificationWorkflow:
     """公司信息验证工作流，确保工具按search->crawl->verify的顺序衔接"""
     
+    # 逐页爬取和验证时的最大并发请求数，避免触发目标站点限流
+    PAGE_CONCURRENCY = 5
+    
     def __init__(self, mcp_server):
-        """初始化工作流"""
+        """初始化工作流
+        
+        Args:
+            mcp_server: 已启动的MCP服务器连接
+        """
         self.mcp_server = mcp_server
         self.search_results = []
         self.crawl_results = []
         self.verify_results = []
     
+    @staticmethod
+    def _as_dict(result):
+        """将工具结果统一为字典，无法解析时返回None"""
+        if isinstance(result, dict):
+            return result
+        if isinstance(result, str):
+            try:
+                parsed = _json_loads(result)
+            except json.JSONDecodeError:
+                return None
+            return parsed if isinstance(parsed, dict) else None
+        return None
+    
+    def _coerce_result(self, result, step, primary_key, fallback_key=None):
+        """解析工具结果并取出列表字段
+        
+        Args:
+            result: call_tool返回的原始结果
+            step: 步骤名称，用于日志
+            primary_key: 结果列表所在字段
+            fallback_key: 兼容的备用字段
+            
+        Returns:
+            (解析后的字典, 结果列表)；格式不符合预期时结果列表为None
+        """
+        parsed = self._as_dict(result)
+        if parsed is None:
+            logger.error(f"无法解析{step}结果，类型: {type(result)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"原始{step}结果: {result}")
+            return None, None
+        
+        if parsed.get("success"):
+            for key in (primary_key, fallback_key):
+                if key and key in parsed:
+                    return parsed, parsed[key] or []
+        
+        logger.warning(f"{step}结果格式不符合预期")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"原始{step}结果: {parsed}")
+        return parsed, None
+    
     async def execute_search(self, company_name: str) -> Dict[str, Any]:
         """执行搜索步骤"""
         logger.info(f"开始搜索公司信息: {company_name}")
@@ -210,43 +695,46 @@ class CompanyVerificationWorkflow:
         result = await self.mcp_server.call_tool("search_company", search_args)
         
         # 解析搜索结果
-        try:
-            # 返回的结果可能已经是解析后的JSON对象
-            if isinstance(result, dict) and "success" in result and "results" in result:
-                self.search_results = result.get("results", [])
-                logger.info(f"搜索成功，找到 {len(self.search_results)} 条结果")
-            # 或者可能是字符串，需要解析
-            elif isinstance(result, str):
-                try:
-                    parsed_result = json.loads(result)
-                    if parsed_result.get("success") and "results" in parsed_result:
-                        self.search_results = parsed_result["results"]
-                        logger.info(f"搜索成功，找到 {len(self.search_results)} 条结果")
-                    else:
-                        logger.warning(f"搜索结果格式不符合预期: {parsed_result}")
-                except json.JSONDecodeError:
-                    logger.error(f"无法解析搜索结果: {result}")
-            else:
-                logger.error(f"搜索结果类型异常: {type(result)}")
-                logger.debug(f"原始搜索结果: {result}")
-        except Exception as e:
-            logger.error(f"处理搜索结果时出错: {e}")
+        _, items = self._coerce_result(result, "搜索", "results")
+        if items is not None:
+            self.search_results = items
+            logger.info(f"搜索成功，找到 {len(self.search_results)} 条结果")
         
         return {"search_results": self.search_results}
     
     async def extract_linkedin_urls(self) -> List[str]:
         """从搜索结果中提取LinkedIn页面URL"""
-        linkedin_urls = []
-        for result in self.search_results:
-            url = result.get("url", "")
-            # 检查URL是否为LinkedIn公司页面
-            if "linkedin.com/company/" in url.lower():
-                linkedin_urls.append(url)
-                logger.info(f"找到LinkedIn公司页面: {url}")
+        urls = (result.get("url", "") for result in self.search_results)
+        linkedin_urls = [url for url in urls if _LINKEDIN_COMPANY_RE.search(url)]
         
         logger.info(f"共提取到 {len(linkedin_urls)} 个LinkedIn公司页面")
         return linkedin_urls
     
+    async def _call_per_url(self, urls: List[str], tool_name: str, make_args, step: str) -> List[Dict[str, Any]]:
+        """对每个URL单独调用工具，并发数受PAGE_CONCURRENCY限制
+        
+        Args:
+            urls: URL列表
+            tool_name: 工具名称
+            make_args: 根据URL生成工具参数的函数
+            step: 步骤名称，用于日志
+            
+        Returns:
+            与urls顺序一致的结果列表，调用失败的位置为对应的异常对象
+        """
+        semaphore = asyncio.Semaphore(self.PAGE_CONCURRENCY)
+        
+        async def call(url):
+            async with semaphore:
+                return await self.mcp_server.call_tool(tool_name, make_args(url))
+        
+        results = await asyncio.gather(*[call(url) for url in urls], return_exceptions=True)
+        
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{step}页面失败 {url}: {result}")
+        return results
+    
     async def execute_crawl(self, urls: List[str]) -> Dict[str, Any]:
         """执行爬取步骤"""
         if not urls:
@@ -254,152 +742,133 @@ class CompanyVerificationWorkflow:
             return {"crawl_results": []}
         
         logger.info(f"开始爬取 {len(urls)} 个LinkedIn页面")
-        crawl_args = {"urls": urls}
-        result = await self.mcp_server.call_tool("crawl_multiple_pages", crawl_args)
+        # 每个URL单独请求，单个页面变慢或失败不会拖累其他页面
+        results = await self._call_per_url(
+            urls, "crawl_multiple_pages", lambda url: {"urls": [url]}, "爬取"
+        )
         
-        # 解析爬取结果
-        try:
-            # 如果结果已经是字典类型
-            if isinstance(result, dict):
-                # 检查'results'字段（实际返回格式）
-                if "success" in result and "results" in result:
-                    self.crawl_results = result.get("results", [])
-                    logger.info(f"爬取成功，获取到 {len(self.crawl_results)} 个页面内容")
-                # 兼容'pages'字段（原预期格式）
-                elif "success" in result and "pages" in result:
-                    self.crawl_results = result.get("pages", [])
-                    logger.info(f"爬取成功，获取到 {len(self.crawl_results)} 个页面内容")
-                else:
-                    logger.warning(f"爬取结果格式不符合预期: {result}")
-            # 如果结果是字符串，尝试解析为JSON
-            elif isinstance(result, str):
-                try:
-                    parsed_result = json.loads(result)
-                    # 检查'results'字段（实际返回格式）
-                    if parsed_result.get("success") and "results" in parsed_result:
-                        self.crawl_results = parsed_result["results"]
-                        logger.info(f"爬取成功，获取到 {len(self.crawl_results)} 个页面内容")
-                    # 兼容'pages'字段（原预期格式）
-                    elif parsed_result.get("success") and "pages" in parsed_result:
-                        self.crawl_results = parsed_result["pages"]
-                        logger.info(f"爬取成功，获取到 {len(self.crawl_results)} 个页面内容")
-                    else:
-                        logger.warning(f"爬取结果格式不符合预期: {parsed_result}")
-                except json.JSONDecodeError:
-                    logger.error(f"无法解析爬取结果: {result}")
+        # 解析爬取结果，失败的页面降级为带error的条目
+        self.crawl_results = []
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                self.crawl_results.append({"url": url, "error": str(result)})
+                continue
+            _, items = self._coerce_result(result, "爬取", "results", "pages")
+            if items is not None:
+                self.crawl_results.extend(items)
             else:
-                logger.error(f"爬取结果类型异常: {type(result)}")
-                logger.debug(f"原始爬取结果: {result}")
-        except Exception as e:
-            logger.error(f"处理爬取结果时出错: {e}")
+                self.crawl_results.append({"url": url, "error": "爬取结果格式不符合预期"})
+        logger.info(f"爬取完成，获取到 {len(self.crawl_results)} 个页面内容")
         
         return {"crawl_results": self.crawl_results}
     
+    def _verifiable_pages(self) -> Dict[str, Dict[str, str]]:
+        """从爬取结果中取出可验证的页面，只保留url和content，页面内容字符串直接复用不复制"""
+        return {
+            page["url"]: {"url": page["url"], "content": page["content"]}
+            for page in self.crawl_results
+            if page.get("content") and page.get("url")
+        }
+    
+    def _make_verify_args(self, company_name: str, official_website: Optional[str], pages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """构造verify_multiple_contents的参数"""
+        verify_args = {
+            "company_name": company_name,
+            "pages": pages
+        }
+        if official_website:
+            verify_args["official_website"] = official_website
+        return verify_args
+    
+    def _summarize_verify(self) -> Dict[str, Any]:
+        """根据合并后的验证结果计算最佳匹配等信息"""
+        matches = [r for r in self.verify_results if r.get("success") and r.get("is_match")]
+        logger.info(f"验证完成，得到 {len(self.verify_results)} 个验证结果，其中 {len(matches)} 个匹配")
+        
+        # 存储有用的验证信息以便在结果中使用
+        self.best_match = max(matches, key=lambda r: r.get("match_score") or 0) if matches else None
+        self.linkedin_url = self.best_match["url"] if self.best_match else None
+        self.linkedin_found = bool(matches)
+        self.match_count = len(matches)
+        
+        return {"verify_results": self.verify_results}
+    
     async def execute_verify(self, company_name: str, official_website: Optional[str] = None) -> Dict[str, Any]:
         """执行验证步骤"""
         if not self.crawl_results:
             logger.warning("没有爬取结果，验证步骤将被跳过")
             return {"verify_results": []}
         
-        # 准备验证参数
-        pages = []
-        for page in self.crawl_results:
-            if page.get("content") and page.get("url"):
-                pages.append({
-                    "url": page["url"],
-                    "content": page["content"]
-                })
-        
+        pages = self._verifiable_pages()
         if not pages:
             logger.warning("没有有效的页面内容，验证步骤将被跳过")
             return {"verify_results": []}
         
         logger.info(f"开始验证 {len(pages)} 个页面内容是否匹配公司: {company_name}")
-        verify_args = {
-            "company_name": company_name,
-            "pages": pages
-        }
-        
-        if official_website:
-            verify_args["official_website"] = official_website
-        
-        result = await self.mcp_server.call_tool("verify_multiple_contents", verify_args)
+        results = await self._call_per_url(
+            list(pages),
+            "verify_multiple_contents",
+            lambda url: self._make_verify_args(company_name, official_website, [pages[url]]),
+            "验证"
+        )
         
-        # 解析验证结果
-        try:
-            # 如果结果已经是字典类型
-            if isinstance(result, dict):
-                # 检查'results'字段（实际返回格式）
-                if "success" in result and "results" in result:
-                    self.verify_results = result.get("results", [])
-                    logger.info(f"验证成功，得到 {len(self.verify_results)} 个验证结果")
-                    
-                    # 存储有用的验证信息以便在结果中使用
-                    self.best_match = result.get("best_match")
-                    self.linkedin_url = result.get("linkedin_url")
-                    self.linkedin_found = result.get("linkedin", False)
-                    self.match_count = result.get("match_count", 0)
-                # 兼容'verifications'字段（原预期格式）
-                elif "success" in result and "verifications" in result:
-                    self.verify_results = result.get("verifications", [])
-                    logger.info(f"验证成功，得到 {len(self.verify_results)} 个验证结果")
-                else:
-                    logger.warning(f"验证结果格式不符合预期: {result}")
-            # 如果结果是字符串，尝试解析为JSON
-            elif isinstance(result, str):
-                try:
-                    parsed_result = json.loads(result)
-                    # 检查'results'字段（实际返回格式）
-                    if parsed_result.get("success") and "results" in parsed_result:
-                        self.verify_results = parsed_result["results"]
-                        logger.info(f"验证成功，得到 {len(self.verify_results)} 个验证结果")
-                        
-                        # 存储有用的验证信息以便在结果中使用
-                        self.best_match = parsed_result.get("best_match")
-                        self.linkedin_url = parsed_result.get("linkedin_url") 
-                        self.linkedin_found = parsed_result.get("linkedin", False)
-                        self.match_count = parsed_result.get("match_count", 0)
-                    # 兼容'verifications'字段（原预期格式）
-                    elif parsed_result.get("success") and "verifications" in parsed_result:
-                        self.verify_results = parsed_result["verifications"]
-                        logger.info(f"验证成功，得到 {len(self.verify_results)} 个验证结果")
-                    else:
-                        logger.warning(f"验证结果格式不符合预期: {parsed_result}")
-                except json.JSONDecodeError:
-                    logger.error(f"无法解析验证结果: {result}")
+        # 解析验证结果，合并各页面的结果
+        self.verify_results = []
+        for url, result in zip(pages, results):
+            if isinstance(result, Exception):
+                self.verify_results.append({"url": url, "success": False, "error": str(result), "is_match": False})
+                continue
+            _, items = self._coerce_result(result, "验证", "results", "verifications")
+            if items is not None:
+                self.verify_results.extend(items)
             else:
-                logger.error(f"验证结果类型异常: {type(result)}")
-                logger.debug(f"原始验证结果: {result}")
-        except Exception as e:
-            logger.error(f"处理验证结果时出错: {e}")
+                self.verify_results.append({"url": url, "success": False, "error": "验证结果格式不符合预期", "is_match": False})
         
-        return {"verify_results": self.verify_results}
+        return self._summarize_verify()
     
-    async def run_complete_workflow(self, company_name: str, official_website: Optional[str] = None) -> Dict[str, Any]:
-        """执行完整的工作流程：搜索->爬取->验证"""
-        # 初始化成员变量
+    def make_verify_call(self, company_name: str, official_website: Optional[str] = None):
+        """为批量验证构造一个包含全部页面的工具调用
+        
+        Returns:
+            (tool_name, arguments) 元组；没有可验证的页面时返回None
+        """
+        pages = self._verifiable_pages()
+        if not pages:
+            return None
+        return ("verify_multiple_contents", self._make_verify_args(company_name, official_website, list(pages.values())))
+    
+    def apply_verify_result(self, result) -> Dict[str, Any]:
+        """解析make_verify_call对应的工具结果"""
+        _, items = self._coerce_result(result, "验证", "results", "verifications")
+        self.verify_results = items or []
+        return self._summarize_verify()
+    
+    async def search_and_crawl(self, company_name: str) -> None:
+        """执行搜索和爬取步骤"""
+        # 初始化成员变量，避免沿用上一次运行的结果
+        self.search_results = []
+        self.crawl_results = []
+        self.verify_results = []
         self.best_match = None
         self.linkedin_url = None
         self.linkedin_found = False
         self.match_count = 0
         
         # 步骤1: 搜索公司信息
-        search_result = await self.execute_search(company_name)
+        self.search_result = await self.execute_search(company_name)
         
         # 步骤2: 从搜索结果中提取LinkedIn URL
         linkedin_urls = await self.extract_linkedin_urls()
         
         # 步骤3: 爬取LinkedIn页面
-        crawl_result = await self.execute_crawl(linkedin_urls)
-        
-        # 步骤4: 验证页面内容
-        verify_result = await self.execute_verify(company_name, official_website)
-        
-        # 合并所有结果
+        self.crawl_result = await self.execute_crawl(linkedin_urls)
+    
+    def build_result(self, company_name: str, official_website: Optional[str], verify_result: Dict[str, Any]) -> Dict[str, Any]:
+        """合并各步骤的结果"""
         final_result = {
             "company_name": company_name,
-            "search": search_result,
-            "crawl": crawl_result,
+            "search": self.search_result,
+            "crawl": self.crawl_result,
             "verify": verify_result,
             "success": self.linkedin_found and self.match_count > 0
         }
@@ -418,59 +887,277 @@ class CompanyVerificationWorkflow:
             final_result["best_match"] = self.best_match
         
         return final_result
+    
+    async def run_complete_workflow(self, company_name: str, official_website: Optional[str] = None) -> Dict[str, Any]:
+        """执行完整的工作流程：搜索->爬取->验证"""
+        await self.search_and_crawl(company_name)
+        
+        # 步骤4: 验证页面内容
+        verify_result = await self.execute_verify(company_name, official_website)
+        
+        return self.build_result(company_name, official_website, verify_result)
+
+
+class VerificationDiskCache:
+    """跨进程的验证结果缓存，结果以zlib压缩的JSON存入SQLite
+    
+    SQLite操作在线程池中执行，不阻塞事件循环；每次操作使用独立连接，
+    读写失败只记录警告，不影响验证本身。
+    """
+    
+    def __init__(self, path=_VERIFY_CACHE_PATH, ttl=_VERIFY_CACHE_TTL):
+        """初始化缓存
+        
+        Args:
+            path: SQLite数据库文件路径
+            ttl: 结果有效期（秒）
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+    
+    @staticmethod
+    def make_key(key):
+        """将(公司名称, 官方网站)元组转换为数据库主键"""
+        return _json_dumps_bytes(list(key)).decode()
+    
+    def _connect(self):
+        """打开数据库连接，不存在时建表"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS verify_cache (key TEXT PRIMARY KEY, ts REAL, result BLOB)"
+        )
+        return conn
+    
+    def _get_sync(self, key):
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT ts, result FROM verify_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return _json_loads(zlib.decompress(row[1]))
+    
+    def _put_sync(self, key, blob):
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO verify_cache (key, ts, result) VALUES (?, ?, ?)",
+                (key, time.time(), blob)
+            )
+    
+    async def get(self, key):
+        """读取未过期的结果，不存在、过期或读取失败时返回None"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self._get_sync, self.make_key(key))
+        except (sqlite3.Error, OSError, zlib.error, ValueError) as e:
+            logger.warning(f"读取验证结果磁盘缓存失败: {e}")
+            return None
+    
+    async def put(self, key, result):
+        """写入结果"""
+        blob = zlib.compress(_json_dumps_bytes(result), 1)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._put_sync, self.make_key(key), blob)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"写入验证结果磁盘缓存失败: {e}")
+    
+    def clear(self):
+        """删除缓存数据库文件"""
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"删除验证结果磁盘缓存失败: {e}")
+
+
+class RateLimiter:
+    """令牌桶限流器，同时限制每分钟请求数和每分钟token数"""
+    
+    def __init__(self, max_requests_per_minute, max_tokens_per_minute):
+        """初始化限流器
+        
+        Args:
+            max_requests_per_minute: 每分钟最多请求数
+            max_tokens_per_minute: 每分钟最多token数
+        """
+        if max_requests_per_minute <= 0 or max_tokens_per_minute <= 0:
+            raise ValueError("限流器的每分钟请求数和token数必须为正数")
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self._available_requests = float(max_requests_per_minute)
+        self._available_tokens = float(max_tokens_per_minute)
+        self._last_update = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    @classmethod
+    def from_env(cls):
+        """从OPENAI_MAX_REQUESTS_PER_MINUTE和OPENAI_MAX_TOKENS_PER_MINUTE环境变量创建限流器，均未设置时返回None"""
+        rpm = os.environ.get("OPENAI_MAX_REQUESTS_PER_MINUTE")
+        tpm = os.environ.get("OPENAI_MAX_TOKENS_PER_MINUTE")
+        if not rpm and not tpm:
+            return None
+        return cls(
+            cls._parse_limit("OPENAI_MAX_REQUESTS_PER_MINUTE", rpm, _DEFAULT_MAX_REQUESTS_PER_MINUTE),
+            cls._parse_limit("OPENAI_MAX_TOKENS_PER_MINUTE", tpm, _DEFAULT_MAX_TOKENS_PER_MINUTE)
+        )
+    
+    @staticmethod
+    def _parse_limit(name, value, default):
+        """解析环境变量中的限额，未设置、非数字或不为正数时使用默认值"""
+        if not value:
+            return float(default)
+        try:
+            limit = float(value)
+        except ValueError:
+            limit = None
+        if limit is None or not math.isfinite(limit) or limit <= 0:
+            logger.warning(f"{name}={value!r} 不是有效的正数，使用默认值 {default}")
+            return float(default)
+        return limit
+    
+    def _refill(self):
+        """按经过的时间补充两个桶"""
+        now = time.monotonic()
+        elapsed = now - self._last_update
+        self._last_update = now
+        self._available_requests = min(
+            self.max_requests_per_minute,
+            self._available_requests + elapsed * self.max_requests_per_minute / 60
+        )
+        self._available_tokens = min(
+            self.max_tokens_per_minute,
+            self._available_tokens + elapsed * self.max_tokens_per_minute / 60
+        )
+    
+    async def acquire(self, est_tokens=0):
+        """等待直到请求数和token数都有余量，然后扣除本次消耗"""
+        # 单次估算超过桶容量时按容量计算，避免永远等待
+        est_tokens = min(est_tokens, self.max_tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= est_tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= est_tokens
+                    return
+                wait = max(
+                    (1 - self._available_requests) * 60 / self.max_requests_per_minute,
+                    (est_tokens - self._available_tokens) * 60 / self.max_tokens_per_minute
+                )
+                await asyncio.sleep(wait)
 
 
 class OpenAIAgentWithMCP:
     """使用OpenAI Agent与MCP服务器交互的类"""
     
-    def __init__(self, api_key=None, assistant_id=None, model="gpt-4-turbo"):
-        """初始化OpenAI客户端和Assistant"""
+    def __init__(self, api_key=None, assistant_id=None, model="gpt-4-turbo", mcp_pool_size=1, disk_cache=False):
+        """初始化OpenAI客户端和Assistant
+        
+        Args:
+            api_key: OpenAI API密钥，默认读取OPENAI_API_KEY环境变量
+            assistant_id: 已有助手的ID
+            model: 使用的模型
+            mcp_pool_size: 大于1时额外启动该数量的MCP服务器进程，供并行的直接验证使用
+            disk_cache: 是否将验证结果持久化到磁盘缓存，供之后的进程复用；
+                默认关闭，供反复运行相同公司的测试使用
+        """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY未设置，请提供OpenAI API密钥")
         
-        self.client = OpenAI(api_key=self.api_key)
+        # 整个Agent生命周期共用一个HTTP连接池，今后新增的HTTP客户端也应复用它；
+        # DefaultAsyncHttpxClient保留SDK默认的超时等设置，只调整连接池和协议
+        self.http_client = DefaultAsyncHttpxClient(
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=_HTTP_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+        # 关闭SDK自带的重试，429由_with_rate_limit统一退避重试，避免两层重试叠加
+        self.client = AsyncOpenAI(api_key=self.api_key, http_client=self.http_client, max_retries=0)
+        self.rate_limiter = RateLimiter.from_env()  # 未配置时不限流
         self.assistant_id = assistant_id
         self.assistant = None
         self.thread = None
         self.model = model
         self.mcp_server_process = None
         self.mcp_server = None
+        self.mcp_pool = None
+        self.mcp_pool_size = mcp_pool_size
         self.workflow = None
+        self._start_lock = asyncio.Lock()
+        self._known_tools = set()  # MCP服务器提供的工具名
+        # 验证结果的LRU缓存: key -> (写入时间, 结果)
+        self._result_cache = OrderedDict()
+        self._result_cache_max = 256
+        self._result_cache_ttl = 3600  # 秒
+        self.disk_cache = VerificationDiskCache() if disk_cache else None
+        # 进行中的验证: key -> Future，并发的相同请求共享同一次验证
+        self._inflight_verifications = {}
+        # Assistant工具调用结果的LRU缓存: (工具名, 规范化参数) -> 输出字符串
+        self._tool_result_cache = OrderedDict()
+        self._tool_result_cache_max = 64
     
     async def start_mcp_server(self):
-        """启动MCP服务器并连接到它"""
-        logger.info("启动MCP服务器...")
+        """启动MCP服务器并连接到它，已启动时直接返回工具列表
         
-        # 启动MCP服务器的命令
-        mcp_server_path = "./build/index.js"  # 基于项目构建路径
-        
-        # 创建MCP服务器连接
-        self.mcp_server = MCPServerStdio(
-            params={
+        并发调用时由启动锁保证只启动一次；服务器完成初始化并加载工具列表后
+        才赋值给self.mcp_server，其他调用方不会拿到启动到一半的服务器。
+        """
+        async with self._start_lock:
+            if self.mcp_server:
+                return await self.mcp_server.list_tools()
+            
+            logger.info("启动MCP服务器...")
+            
+            # 启动MCP服务器的命令
+            mcp_server_path = "./build/index.js"  # 基于项目构建路径
+            params = {
                 "command": "node",
                 "args": [mcp_server_path],
-            },
-            cache_tools_list=True  # 缓存工具列表以提高性能
-        )
-        
-        # 开始连接MCP服务器
-        await self.mcp_server.__aenter__()
-        
-        # 获取可用工具列表
-        tools = await self.mcp_server.list_tools()
-        logger.info(f"MCP服务器工具加载完成，共{len(tools['tools'])}个工具")
-        
-        # 初始化工作流
-        self.workflow = CompanyVerificationWorkflow(self.mcp_server)
-        
-        return tools
+            }
+            
+            # 创建MCP服务器连接
+            mcp_server = MCPServerStdio(
+                params=params,
+                cache_tools_list=True  # 缓存工具列表以提高性能
+            )
+            
+            try:
+                # 开始连接MCP服务器
+                await mcp_server.__aenter__()
+                
+                # 获取可用工具列表
+                tools = await mcp_server.list_tools()
+            except BaseException:
+                await mcp_server.__aexit__(None, None, None)
+                raise
+            
+            self._known_tools = {tool.get("name") for tool in tools["tools"]}
+            logger.info(f"MCP服务器工具加载完成，共{len(tools['tools'])}个工具")
+            self.mcp_server = mcp_server
+            
+            # 初始化工作流
+            self.workflow = CompanyVerificationWorkflow(self.mcp_server)
+            
+            # 启动用于并行验证的服务器进程池
+            if self.mcp_pool_size > 1 and not self.mcp_pool:
+                self.mcp_pool = MCPPool(params, size=self.mcp_pool_size)
+                await self.mcp_pool.__aenter__()
+                logger.info(f"MCP服务器进程池已启动，共{self.mcp_pool_size}个进程")
+            
+            return tools
     
     async def create_assistant_if_needed(self):
         """创建或获取助手"""
+        if self.assistant:
+            return self.assistant
+        
         if self.assistant_id:
             try:
-                self.assistant = self.client.beta.assistants.retrieve(self.assistant_id)
+                self.assistant = await self._call_api(self.client.beta.assistants.retrieve, self.assistant_id)
                 logger.info(f"已获取现有助手: {self.assistant.name}")
                 return self.assistant
             except Exception as e:
@@ -486,7 +1173,8 @@ class OpenAIAgentWithMCP:
                 "function": {
                     "name": tool.get("name", f"tool_{i}"),
                     "description": tool.get("description", "MCP工具"),
-                    "parameters": {
+                    # 未定义参数的工具使用空参数定义
+                    "parameters": _TOOL_SCHEMAS.get(tool.get("name")) or {
                         "type": "object",
                         "properties": {},
                         "required": []
@@ -496,69 +1184,11 @@ class OpenAIAgentWithMCP:
             for i, tool in enumerate(tools_data.get("tools", []))
         ]
         
-        # 为每个工具添加参数定义
-        for i, tool in enumerate(tools_data.get("tools", [])):
-            tool_name = tool.get("name", "")
-            if tool_name == "search_company":
-                openai_tools[i]["function"]["parameters"] = {
-                    "type": "object",
-                    "properties": {
-                        "company_name": {
-                            "type": "string",
-                            "description": "要搜索的公司名称"
-                        }
-                    },
-                    "required": ["company_name"]
-                }
-            elif tool_name == "crawl_multiple_pages":
-                openai_tools[i]["function"]["parameters"] = {
-                    "type": "object",
-                    "properties": {
-                        "urls": {
-                            "type": "array",
-                            "items": {
-                                "type": "string"
-                            },
-                            "description": "要爬取的URL列表"
-                        }
-                    },
-                    "required": ["urls"]
-                }
-            elif tool_name == "verify_multiple_contents":
-                openai_tools[i]["function"]["parameters"] = {
-                    "type": "object",
-                    "properties": {
-                        "company_name": {
-                            "type": "string",
-                            "description": "公司名称"
-                        },
-                        "pages": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "url": {
-                                        "type": "string"
-                                    },
-                                    "content": {
-                                        "type": "string"
-                                    }
-                                }
-                            },
-                            "description": "要验证的页面内容列表"
-                        },
-                        "official_website": {
-                            "type": "string",
-                            "description": "公司官方网站（可选）"
-                        }
-                    },
-                    "required": ["company_name", "pages"]
-                }
-        
         # 创建新助手
-        self.assistant = self.client.beta.assistants.create(
+        self.assistant = await self._call_api(
+            self.client.beta.assistants.create,
             name="商机通助手",
-            instructions="你是一个帮助验证公司信息的AI助手，可以搜索、提取和验证公司信息。你有以下工具可用：\n1. search_company: 搜索公司信息\n2. crawl_multiple_pages: 爬取多个LinkedIn页面\n3. verify_multiple_contents: 验证页面内容是否匹配公司",
+            instructions=_STATIC_INSTRUCTIONS,
             model=self.model,
             tools=openai_tools
         )
@@ -568,7 +1198,7 @@ class OpenAIAgentWithMCP:
     
     async def create_thread(self):
         """创建新的对话线程"""
-        self.thread = self.client.beta.threads.create()
+        self.thread = await self._call_api(self.client.beta.threads.create)
         logger.info(f"已创建新对话线程，ID: {self.thread.id}")
         return self.thread
     
@@ -577,72 +1207,199 @@ class OpenAIAgentWithMCP:
         if not self.thread:
             await self.create_thread()
         
-        message = self.client.beta.threads.messages.create(
+        message = await self._call_api(
+            self.client.beta.threads.messages.create,
             thread_id=self.thread.id,
             role="user",
-            content=content
+            content=content,
+            est_tokens=len(content)
         )
         logger.info(f"已发送用户消息: {content[:50]}...")
         return message
     
+    async def prime(self):
+        """预热MCP服务器和OpenAI连接
+        
+        向MCP服务器发送ping，并发起一次轻量的models.list请求以建立HTTPS连接，
+        使随后的真实请求不必再等待进程启动和握手。预热失败只记录日志。
+        """
+        if not self.mcp_server:
+            await self.start_mcp_server()
+        
+        results = await asyncio.gather(
+            self.mcp_server.ping(),
+            # 直接调用，不经过限流器和重试，预热不占用真实验证请求的额度
+            self.client.models.list(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.debug(f"预热失败: {result}")
+    
+    async def _call_api(self, func, *args, est_tokens=0, **kwargs):
+        """调用OpenAI API，调用前经过限流器，遇到429时按指数退避重试"""
+        return await self._with_rate_limit(lambda: func(*args, **kwargs), est_tokens)
+    
+    async def _acquire_rate_limit(self, est_tokens=0):
+        """等待限流器放行，未配置限流时立即返回"""
+        if self.rate_limiter:
+            await self.rate_limiter.acquire(est_tokens)
+    
+    async def _with_rate_limit(self, make_call, est_tokens=0):
+        """在限流器允许后执行调用，遇到RateLimitError时指数退避重试
+        
+        Args:
+            make_call: 每次尝试时调用，返回待等待的协程或Future
+            est_tokens: 本次调用预计消耗的token数
+        """
+        for attempt in range(_RATE_LIMIT_MAX_ATTEMPTS):
+            await self._acquire_rate_limit(est_tokens)
+            try:
+                return await make_call()
+            except RateLimitError:
+                if attempt == _RATE_LIMIT_MAX_ATTEMPTS - 1:
+                    raise
+                delay = 2 ** attempt + random.random()
+                logger.warning(f"触发OpenAI限流，{delay:.1f}秒后重试 (第{attempt + 1}次)")
+                await asyncio.sleep(delay)
+    
+    async def _run_tool_call(self, tool_call):
+        """执行单个工具调用，返回提交给Assistant的输出
+        
+        任何异常（包括参数解析失败）都会转换为错误输出，
+        保证并发执行时单个工具失败不会影响其他工具的结果。
+        """
+        function_name = tool_call.function.name
+        
+        try:
+            function_args = _json_loads(tool_call.function.arguments)
+            logger.info(f"调用工具: {function_name}，参数: {function_args}")
+            
+            cache_key = (function_name, _json_dumps_bytes(function_args, sort_keys=True))
+            result_str = self._tool_result_cache.get(cache_key)
+            if result_str is not None:
+                self._tool_result_cache.move_to_end(cache_key)
+                logger.info(f"命中工具结果缓存: {function_name}")
+            else:
+                # 执行MCP工具调用
+                if function_name in self._known_tools:
+                    result = await self.mcp_server.call_tool(function_name, function_args)
+                else:
+                    result = {"error": f"未知工具: {function_name}"}
+                
+                # 将结果转换为字符串
+                result_str = _json_dumps_bytes(result).decode()
+                
+                if not (isinstance(result, dict) and "error" in result):
+                    self._tool_result_cache[cache_key] = result_str
+                    while len(self._tool_result_cache) > self._tool_result_cache_max:
+                        self._tool_result_cache.popitem(last=False)
+            
+        except Exception as e:
+            logger.error(f"工具调用失败: {e}")
+            result_str = _json_dumps_bytes({"error": str(e)}).decode()
+        
+        return {
+            "tool_call_id": tool_call.id,
+            "output": result_str
+        }
+    
+    async def _run_required_tool_calls(self, run):
+        """并发执行运行所请求的全部工具调用，返回待提交的输出列表"""
+        # 使用已有助手时MCP服务器可能尚未启动，需在并发调用前启动一次
+        if not self.mcp_server:
+            await self.start_mcp_server()
+        
+        # 并发执行所有工具调用，总耗时取决于最慢的一个
+        tool_calls = run.required_action.submit_tool_outputs.tool_calls
+        tool_outputs = await asyncio.gather(
+            *[self._run_tool_call(tool_call) for tool_call in tool_calls]
+        )
+        return list(tool_outputs)
+    
+    async def stream_thread(self):
+        """以流式方式运行线程，逐个产出Assistant事件
+        
+        需要工具调用时自动执行并以流式方式提交结果，后续事件继续产出，
+        调用方可以在回复生成的同时逐段输出。
+        """
+        if not self.assistant:
+            await self.create_assistant_if_needed()
+        
+        stream = await self._call_api(
+            self.client.beta.threads.runs.create,
+            thread_id=self.thread.id,
+            assistant_id=self.assistant.id,
+            stream=True
+        )
+        
+        while stream is not None:
+            next_stream = None
+            async for event in stream:
+                yield event
+                
+                if event.event == "thread.run.requires_action":
+                    logger.info("需要执行工具调用")
+                    run = event.data
+                    tool_outputs = await self._run_required_tool_calls(run)
+                    next_stream = await self._call_api(
+                        self.client.beta.threads.runs.submit_tool_outputs,
+                        thread_id=self.thread.id,
+                        run_id=run.id,
+                        tool_outputs=tool_outputs,
+                        stream=True
+                    )
+                    logger.info("已提交工具调用结果")
+                elif event.event in ("thread.run.completed", "thread.run.failed",
+                                     "thread.run.cancelled", "thread.run.expired"):
+                    logger.info(f"运行完成，最终状态: {event.data.status}")
+                    self._log_usage(event.data)
+            stream = next_stream
+    
+    async def stream_response_text(self):
+        """流式运行线程，只产出助手回复的文本片段"""
+        async for event in self.stream_thread():
+            if event.event == "thread.message.delta":
+                for part in event.data.delta.content or []:
+                    if part.type == "text" and part.text and part.text.value:
+                        yield part.text.value
+    
     async def run_thread(self):
         """运行线程并等待完成"""
         if not self.assistant:
             await self.create_assistant_if_needed()
         
-        run = self.client.beta.threads.runs.create(
+        run = await self._call_api(
+            self.client.beta.threads.runs.create,
             thread_id=self.thread.id,
             assistant_id=self.assistant.id
         )
         logger.info(f"已启动运行，ID: {run.id}")
         
-        # 等待运行完成或需要响应
+        # 等待运行完成或需要响应，轮询间隔按指数退避增长，状态变化时重置
+        poll_count = 0
+        last_status = None
         while True:
-            run = self.client.beta.threads.runs.retrieve(
+            # 通过原始响应读取服务器建议的下次轮询间隔
+            raw_response = await self._call_api(
+                self.client.beta.threads.runs.with_raw_response.retrieve,
                 thread_id=self.thread.id,
                 run_id=run.id
             )
+            run = raw_response.parse()
+            
+            if run.status != last_status:
+                last_status = run.status
+                poll_count = 0
             
             # 检查运行状态
             if run.status == "requires_action" and run.required_action and run.required_action.type == "submit_tool_outputs":
                 logger.info("需要执行工具调用")
-                
-                # 处理工具调用请求
-                tool_calls = run.required_action.submit_tool_outputs.tool_calls
-                tool_outputs = []
-                
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    logger.info(f"调用工具: {function_name}，参数: {function_args}")
-                    
-                    try:
-                        # 执行MCP工具调用
-                        if function_name == "search_company":
-                            result = await self.mcp_server.call_tool("search_company", function_args)
-                        elif function_name == "crawl_multiple_pages":
-                            result = await self.mcp_server.call_tool("crawl_multiple_pages", function_args)
-                        elif function_name == "verify_multiple_contents":
-                            result = await self.mcp_server.call_tool("verify_multiple_contents", function_args)
-                        else:
-                            result = {"error": f"未知工具: {function_name}"}
-                        
-                        # 将结果转换为字符串
-                        result_str = json.dumps(result, ensure_ascii=False)
-                        
-                    except Exception as e:
-                        logger.error(f"工具调用失败: {e}")
-                        result_str = json.dumps({"error": str(e)}, ensure_ascii=False)
-                    
-                    # 添加到输出结果
-                    tool_outputs.append({
-                        "tool_call_id": tool_call.id,
-                        "output": result_str
-                    })
+                tool_outputs = await self._run_required_tool_calls(run)
                 
                 # 提交工具调用结果
-                run = self.client.beta.threads.runs.submit_tool_outputs(
+                run = await self._call_api(
+                    self.client.beta.threads.runs.submit_tool_outputs,
                     thread_id=self.thread.id,
                     run_id=run.id,
                     tool_outputs=tool_outputs
@@ -652,18 +1409,56 @@ class OpenAIAgentWithMCP:
             # 检查是否完成
             elif run.status in ["completed", "failed", "cancelled", "expired"]:
                 logger.info(f"运行完成，最终状态: {run.status}")
+                self._log_usage(run)
                 break
             
             # 继续等待
             else:
                 logger.info(f"运行状态: {run.status}，等待完成...")
-                await asyncio.sleep(2)  # 轮询间隔
+                delay = self._poll_delay(poll_count, raw_response.headers.get("openai-poll-after-ms"))
+                poll_count += 1
+                await asyncio.sleep(delay)  # 轮询间隔
         
         return run
     
+    @staticmethod
+    def _poll_delay(poll_count, poll_after_ms=None):
+        """计算下次轮询前的等待时间（秒）
+        
+        服务器通过openai-poll-after-ms响应头给出建议间隔时以它为准（限制在0.1~2秒之间，
+        避免0或负值导致连续轮询），否则从0.1秒开始按1.6倍指数退避，最长2秒。
+        """
+        if poll_after_ms:
+            try:
+                return max(_POLL_INITIAL_DELAY, min(_POLL_MAX_DELAY, int(poll_after_ms) / 1000))
+            except ValueError:
+                pass
+        return min(_POLL_MAX_DELAY, _POLL_INITIAL_DELAY * _POLL_BACKOFF ** poll_count)
+    
+    @staticmethod
+    def _log_usage(run):
+        """记录运行的token用量，包括命中提示缓存的token数"""
+        usage = getattr(run, "usage", None)
+        if not usage:
+            return
+        # Run.usage的模型没有声明prompt_tokens_details，API返回时它作为额外字段
+        # 保存在model_extra中，值是未解析的字典
+        details = getattr(usage, "prompt_tokens_details", None)
+        if details is None:
+            details = (getattr(usage, "model_extra", None) or {}).get("prompt_tokens_details")
+        if isinstance(details, dict):
+            cached_tokens = details.get("cached_tokens")
+        else:
+            cached_tokens = getattr(details, "cached_tokens", None)
+        logger.info(
+            f"token用量: 输入 {usage.prompt_tokens}，输出 {usage.completion_tokens}，"
+            f"命中缓存 {cached_tokens if cached_tokens is not None else 'N/A'}"
+        )
+    
     async def get_assistant_responses(self):
         """获取助手的回复"""
-        messages = self.client.beta.threads.messages.list(
+        messages = await self._call_api(
+            self.client.beta.threads.messages.list,
             thread_id=self.thread.id
         )
         
@@ -678,27 +1473,258 @@ class OpenAIAgentWithMCP:
         
         return responses
     
-    async def direct_verify_company(self, company_name: str, official_website: Optional[str] = None):
-        """直接使用工作流验证公司信息，无需通过Assistant"""
+    async def direct_verify_company(self, company_name: str, official_website: Optional[str] = None,
+                                    use_cache: bool = True, refresh: bool = False):
+        """直接使用工作流验证公司信息，无需通过Assistant
+        
+        每次调用使用独立的工作流实例，可以安全地并发调用。
+        use_cache为False时既不读取也不写入验证结果缓存；
+        refresh为True时忽略已缓存的结果重新验证，并用新结果更新缓存。
+        """
+        if not self.mcp_server:
+            await self.start_mcp_server()
+        
+        if not use_cache:
+            return await self._verify_uncached(company_name, official_website)
+        
+        key = self._cache_key(company_name, official_website)
+        if not refresh:
+            cached = await self._get_cached(key, company_name)
+            if cached is not None:
+                return cached
+        
+        # 相同的验证正在进行时直接等待它的结果，批量列表中的重复公司只验证一次
+        inflight = self._inflight_verifications.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._verify_and_persist(key, company_name, official_website))
+            self._inflight_verifications[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight_verifications.pop(key, None))
+        else:
+            logger.info(f"等待进行中的相同验证: {company_name}")
+        results = await asyncio.shield(inflight)
+        
+        # 只缓存成功的结果，失败可能是暂时性的
+        if results.get("success"):
+            self._store_result(key, results)
+        
+        return copy.deepcopy(results)
+    
+    async def direct_verify_companies(self, items, max_concurrency=4, use_cache: bool = True, refresh: bool = False):
+        """批量验证多家公司
+        
+        各公司的搜索和爬取并发执行，之后所有公司的验证请求在一次批量写入中发给MCP服务器，
+        由服务器并行完成。批量验证失败的公司单独退回逐页验证。
+        配置了进程池时，整批验证使用池中的同一个服务器。
+        
+        Args:
+            items: (公司名称, 官方网站或None) 列表
+            max_concurrency: 同时进行搜索和爬取的公司数上限
+            use_cache: 是否使用验证结果缓存
+            refresh: 是否忽略已缓存的结果重新验证
+            
+        Returns:
+            与items顺序一致的结果列表，出错的公司对应异常对象
+        """
         if not self.mcp_server:
             await self.start_mcp_server()
         
-        logger.info(f"开始直接验证公司: {company_name}")
-        results = await self.workflow.run_complete_workflow(company_name, official_website)
+        keys = [self._cache_key(company_name, official_website) for company_name, official_website in items]
+        results = [None] * len(items)
+        # 需要验证的公司，列表中重复的公司只验证一次
+        pending = {}
+        for index, (key, (company_name, official_website)) in enumerate(zip(keys, items)):
+            if use_cache and not refresh:
+                results[index] = await self._get_cached(key, company_name)
+            if results[index] is None:
+                pending.setdefault(key, (company_name, official_website))
+        
+        if pending:
+            computed = dict(zip(pending, await self._verify_batch(list(pending.values()), max_concurrency)))
+            
+            # 只缓存成功的结果，失败可能是暂时性的
+            for key, result in computed.items():
+                if use_cache and not isinstance(result, Exception) and result.get("success"):
+                    self._store_result(key, result)
+                    if self.disk_cache:
+                        await self.disk_cache.put(key, result)
+            
+            for index, key in enumerate(keys):
+                if results[index] is None:
+                    result = computed[key]
+                    results[index] = result if isinstance(result, Exception) else copy.deepcopy(result)
+        
+        return results
+    
+    async def _verify_batch(self, items, max_concurrency):
+        """使用进程池中的一个服务器（如有）执行整批验证，批量请求需要发往同一个服务器"""
+        if self.mcp_pool:
+            async with self.mcp_pool.acquire() as server:
+                return await self._verify_batch_on(server, items, max_concurrency)
+        return await self._verify_batch_on(self.mcp_server, items, max_concurrency)
+    
+    async def _verify_batch_on(self, server, items, max_concurrency):
+        """在指定服务器上并发搜索和爬取，再批量验证，返回与items顺序一致的结果或异常"""
+        logger.info(f"开始批量验证 {len(items)} 家公司")
+        semaphore = asyncio.Semaphore(max_concurrency)
+        # 工作流实例保存单次运行的中间结果，每家公司使用独立实例
+        workflows = [CompanyVerificationWorkflow(server) for _ in items]
+        
+        async def search_and_crawl(workflow, company_name):
+            async with semaphore:
+                await workflow.search_and_crawl(company_name)
+        
+        # 搜索或爬取出错的公司对应异常对象，正常完成的为None
+        errors = await asyncio.gather(
+            *[search_and_crawl(workflow, company_name) for workflow, (company_name, _) in zip(workflows, items)],
+            return_exceptions=True
+        )
+        
+        calls = []
+        owners = []
+        for index, (workflow, item, error) in enumerate(zip(workflows, items, errors)):
+            if error is None:
+                call = workflow.make_verify_call(*item)
+                if call:
+                    calls.append(call)
+                    owners.append(index)
+                else:
+                    logger.warning(f"{item[0]}: 没有有效的页面内容，验证步骤将被跳过")
+        
+        verify_steps = {}
+        if calls:
+            logger.info(f"批量验证 {len(calls)} 家公司的页面内容")
+            # 验证会触发MCP服务器中的OpenAI调用，同样计入限流；
+            # 服务器的错误不会以RateLimitError的形式返回，因此只占用额度不重试
+            est_tokens = _VERIFY_TOKEN_ESTIMATE * len(calls)
+            await self._acquire_rate_limit(est_tokens)
+            try:
+                outputs = await server.call_tools_batch(calls, return_exceptions=True)
+            except Exception as e:
+                logger.warning(f"批量发送验证请求失败: {e}")
+                outputs = [e] * len(calls)
+            
+            # 只有验证失败的公司退回逐页验证，已成功的结果直接使用
+            failed = []
+            for index, output in zip(owners, outputs):
+                if isinstance(output, Exception):
+                    logger.warning(f"{items[index][0]}: 批量验证失败: {output}")
+                    failed.append(index)
+                else:
+                    verify_steps[index] = workflows[index].apply_verify_result(output)
+            
+            if failed:
+                logger.info(f"{len(failed)} 家公司改为逐页验证")
+                fallback = await asyncio.gather(
+                    *[workflows[index].execute_verify(*items[index]) for index in failed],
+                    return_exceptions=True
+                )
+                verify_steps.update(zip(failed, fallback))
+        
+        results = []
+        for index, (workflow, item, error) in enumerate(zip(workflows, items, errors)):
+            verify_step = verify_steps.get(index, {"verify_results": []})
+            if error is not None:
+                results.append(error)
+            elif isinstance(verify_step, Exception):
+                results.append(verify_step)
+            else:
+                results.append(workflow.build_result(item[0], item[1], verify_step))
+        return results
+    
+    @staticmethod
+    def _cache_key(company_name, official_website):
+        """验证结果缓存的键：忽略大小写和首尾空白"""
+        return (company_name.lower().strip(), (official_website or "").lower().strip())
+    
+    async def _get_cached(self, key, company_name):
+        """依次查找内存和磁盘缓存，未命中时返回None"""
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            cached_at, cached_result = cached
+            if time.monotonic() - cached_at <= self._result_cache_ttl:
+                self._result_cache.move_to_end(key)
+                logger.info(f"命中验证缓存: {company_name}")
+                return copy.deepcopy(cached_result)
+            del self._result_cache[key]
+        
+        if self.disk_cache:
+            disk_result = await self.disk_cache.get(key)
+            if disk_result is not None:
+                logger.info(f"命中验证结果磁盘缓存: {company_name}")
+                self._store_result(key, disk_result)
+                return disk_result
+        
+        return None
+    
+    def _store_result(self, key, results):
+        """将验证结果的副本写入内存LRU缓存"""
+        self._result_cache[key] = (time.monotonic(), copy.deepcopy(results))
+        self._result_cache.move_to_end(key)
+        while len(self._result_cache) > self._result_cache_max:
+            self._result_cache.popitem(last=False)
+    
+    async def _verify_and_persist(self, key, company_name, official_website):
+        """执行验证，成功的结果同时写入磁盘缓存"""
+        results = await self._verify_uncached(company_name, official_website)
+        if self.disk_cache and results.get("success"):
+            await self.disk_cache.put(key, results)
         return results
     
+    async def _verify_uncached(self, company_name, official_website):
+        """在限流控制下执行一次验证，不经过缓存"""
+        logger.info(f"开始直接验证公司: {company_name}")
+        # 验证会触发MCP服务器中的OpenAI调用，同样计入限流；
+        # 服务器的错误不会以RateLimitError的形式返回，因此只占用额度不重试
+        est_tokens = _VERIFY_TOKEN_ESTIMATE + len(company_name) + len(official_website or "")
+        await self._acquire_rate_limit(est_tokens)
+        return await self._run_workflow(company_name, official_website)
+    
+    async def _run_workflow(self, company_name, official_website):
+        """使用进程池中的服务器（如有）执行一次完整工作流"""
+        if self.mcp_pool:
+            async with self.mcp_pool.acquire() as server:
+                workflow = CompanyVerificationWorkflow(server)
+                return await workflow.run_complete_workflow(company_name, official_website)
+        # 工作流实例保存单次运行的中间结果，并发调用时不能共用
+        workflow = CompanyVerificationWorkflow(self.mcp_server)
+        return await workflow.run_complete_workflow(company_name, official_website)
+    
+    def invalidate_verification_cache(self):
+        """清空验证结果缓存（内存和磁盘）"""
+        self._result_cache.clear()
+        if self.disk_cache:
+            self.disk_cache.clear()
+    
     async def close(self):
-        """关闭MCP服务器连接"""
+        """关闭MCP服务器连接和OpenAI客户端"""
+        if self.mcp_pool:
+            await self.mcp_pool.__aexit__(None, None, None)
+            self.mcp_pool = None
         if self.mcp_server:
             await self.mcp_server.__aexit__(None, None, None)
+            self.mcp_server = None
             logger.info("MCP服务器连接已关闭")
+        # 关闭OpenAI客户端时会一并关闭共享的HTTP连接池
+        await self.client.close()
+
+
+async def ainput(prompt=""):
+    """在线程池中读取用户输入，等待输入期间事件循环上的后台任务继续运行"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, input, prompt)
+
+
+@functools.lru_cache(maxsize=4)
+def _parse_config(config_file, mtime):
+    """解析配置文件，mtime作为缓存键的一部分，文件修改后会重新解析"""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=_YamlLoader)
 
 
 async def load_config(config_file="openai.yaml"):
     """从配置文件加载设置"""
     try:
-        with open(config_file, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = copy.deepcopy(_parse_config(config_file, os.path.getmtime(config_file)))
         logger.info(f"配置已从 {config_file} 加载")
         return config
     except Exception as e:
@@ -724,21 +1750,21 @@ async def interactive_session():
         print("您可以输入公司名称进行搜索和验证，输入 'exit' 退出。")
         
         while True:
-            user_input = input("\n请输入公司名称 (输入'exit'退出): ").strip()
+            user_input = (await ainput("\n请输入公司名称 (输入'exit'退出): ")).strip()
             
             if user_input.lower() in ['exit', 'quit', '退出']:
                 break
             
             # 可选的官方网站
-            official_website = input("请输入官方网站 (可选，直接回车跳过): ").strip()
+            official_website = (await ainput("请输入官方网站 (可选，直接回车跳过): ")).strip()
             if not official_website:
                 official_website = None
                 
             # 是否显示详细结果
-            show_detail = input("是否显示详细结果? (y/n): ").strip().lower() == 'y'
+            show_detail = (await ainput("是否显示详细结果? (y/n): ")).strip().lower() == 'y'
             
             # 选择测试方式
-            test_type = input("选择测试方式: 1=直接工作流, 2=OpenAI Assistant (默认1): ").strip()
+            test_type = (await ainput("选择测试方式: 1=直接工作流, 2=OpenAI Assistant (默认1): ")).strip()
             if not test_type or test_type == '1':
                 # 使用工作流程直接验证
                 print(f"=== 开始测试工作流: 公司名称 '{user_input}' ===")
@@ -774,31 +1800,46 @@ async def interactive_session():
                 # 是否需要详细结果
                 if show_detail:
                     print("\n=== 详细结果 ===")
-                    print(json.dumps(result, ensure_ascii=False, indent=2))
+                    write_json(result)
             else:
                 # 使用OpenAI Assistant验证
                 print(f"\n=== 开始OpenAI Assistant测试: 公司名称 '{user_input}' ===")
                 
-                prompt = f"请帮我验证公司 '{user_input}' 的信息"
+                prompt = _VERIFY_PROMPT_TEMPLATE.format(company=user_input)
                 if official_website:
-                    prompt += f"，官方网站是 {official_website}"
+                    prompt += _WEBSITE_PROMPT_TEMPLATE.format(website=official_website)
                 
                 # 发送消息
                 await agent.send_message(prompt)
                 
-                # 运行对话
-                run = await agent.run_thread()
-                
-                # 获取回复
-                responses = await agent.get_assistant_responses()
-                for i, response in enumerate(responses):
-                    print(f"\nAssistant回复:\n{response}\n")
+                # 流式运行对话，回复边生成边输出
+                print("\nAssistant回复:")
+                async for text in agent.stream_response_text():
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+                print("\n")
     
     finally:
         # 关闭连接
         await agent.close()
 
 
+def install_event_loop_policy():
+    """如果可用，使用uvloop替换默认事件循环，加快子进程管道和网络I/O
+    
+    Returns:
+        是否已启用uvloop
+    """
+    if sys.platform == "win32":
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
 async def main():
     """主函数：演示如何使用OpenAI Agent调用MCP服务器"""
     # 从环境变量获取API密钥
@@ -819,19 +1860,17 @@ async def main():
         # 发送初始消息
         await agent.send_message("你好，请帮我搜索关于'苹果公司'的信息，验证它是否是一家科技公司。")
         
-        # 运行对话
-        run = await agent.run_thread()
-        
-        # 获取回复
-        responses = await agent.get_assistant_responses()
-        for i, response in enumerate(responses):
-            print(f"回复 {i+1}:\n{response}\n")
+        # 流式运行对话，回复边生成边输出
+        async for text in agent.stream_response_text():
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        print("\n")
         
         # 示例2: 直接使用工作流
         print("\n示例2: 直接使用工作流")
         result = await agent.direct_verify_company("苹果公司", "apple.com")
         print("直接验证结果:")
-        print(json.dumps(result, ensure_ascii=False, indent=2))
+        write_json(result)
         
         # 示例3: 交互式会话
         print("\n示例3: 启动交互式会话")
@@ -843,4 +1882,5 @@ async def main():
 
 
 if __name__ == "__main__":
+    install_event_loop_policy()
     asyncio.run(main()) 
\ No newline at end of file
@@ -2,9 +2,10 @@
 
 import os
 import sys
+import io
 import asyncio
 import argparse
-import json
+import contextvars
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -12,19 +13,39 @@ load_dotenv()
 
 # 导入主模块
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from main import OpenAIAgentWithMCP, CompanyVerificationWorkflow
+from main import OpenAIAgentWithMCP, CompanyVerificationWorkflow, ainput, write_json, install_event_loop_policy
 
-async def test_workflow(company_name, official_website=None, verbose=False):
-    """测试工作流功能"""
-    print(f"=== 开始测试工作流: 公司名称 '{company_name}' ===")
+# 加载.env后只读取一次API密钥，整个进程共用
+API_KEY = os.environ.get("OPENAI_API_KEY")
+
+# Assistant测试的用户消息模板，只替换公司名称
+ASSISTANT_PROMPT_TEMPLATE = "你好，请帮我验证'{company}'公司的信息，看看它是什么类型的公司，总部在哪里。"
+
+def create_agent(api_key=API_KEY):
+    """创建Agent，未设置API密钥时返回None
     
-    # 初始化Agent
-    api_key = os.environ.get("OPENAI_API_KEY")
+    测试经常对相同公司反复运行，因此启用验证结果的磁盘缓存，可用--refresh或--no-cache绕过。
+    """
     if not api_key:
         print("错误: 未设置OPENAI_API_KEY环境变量")
-        return False
+        return None
+    return OpenAIAgentWithMCP(api_key=api_key, disk_cache=True)
+
+async def test_workflow(company_name, official_website=None, verbose=False, agent=None, use_cache=True, refresh=False):
+    """测试工作流功能
     
-    agent = OpenAIAgentWithMCP(api_key=api_key)
+    传入agent时复用其MCP服务器和OpenAI客户端，且不会关闭它；
+    否则创建临时Agent并在结束时关闭。use_cache为False时跳过验证结果缓存，
+    refresh为True时忽略缓存重新验证并更新缓存。
+    """
+    print(f"=== 开始测试工作流: 公司名称 '{company_name}' ===")
+    
+    # 初始化Agent
+    owns_agent = agent is None
+    if owns_agent:
+        agent = create_agent()
+        if agent is None:
+            return False
     
     try:
         # 启动MCP服务器
@@ -32,7 +53,7 @@ async def test_workflow(company_name, official_website=None, verbose=False):
         
         # 执行工作流
         print(f"执行验证工作流...")
-        result = await agent.direct_verify_company(company_name, official_website)
+        result = await agent.direct_verify_company(company_name, official_website, use_cache=use_cache, refresh=refresh)
         
         # 打印结果摘要
         print("\n=== 验证结果摘要 ===")
@@ -57,7 +78,7 @@ async def test_workflow(company_name, official_website=None, verbose=False):
         # 详细信息
         if verbose:
             print("\n=== 详细结果 ===")
-            print(json.dumps(result, ensure_ascii=False, indent=2))
+            write_json(result)
             
         return result.get("success", False)
         
@@ -65,20 +86,82 @@ async def test_workflow(company_name, official_website=None, verbose=False):
         print(f"测试过程中出错: {e}")
         return False
     finally:
-        # 关闭服务器连接
-        await agent.close()
+        # 关闭自己创建的Agent
+        if owns_agent:
+            await agent.close()
 
-async def test_assistant(company_name, verbose=False):
-    """测试OpenAI Assistant的功能"""
-    print(f"=== 开始测试OpenAI Assistant: 公司名称 '{company_name}' ===")
+async def test_workflow_batch(companies, max_concurrency=4, verbose=False, agent=None, use_cache=True, refresh=False):
+    """并发测试多个公司的工作流，所有任务共用一个Agent和MCP服务器
+    
+    Args:
+        companies: (公司名称, 官方网站或None) 列表
+        max_concurrency: 同时进行搜索和爬取的公司数上限
+        verbose: 是否输出详细结果
+        agent: 复用的Agent，为None时创建临时Agent
+        use_cache: 是否使用验证结果缓存
+        refresh: 是否忽略已缓存的结果重新验证
+    """
+    print(f"=== 开始批量测试工作流: 共 {len(companies)} 家公司，并发数 {max_concurrency} ===")
     
     # 初始化Agent
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        print("错误: 未设置OPENAI_API_KEY环境变量")
+    owns_agent = agent is None
+    if owns_agent:
+        agent = create_agent()
+        if agent is None:
+            return False
+    
+    try:
+        # 启动MCP服务器
+        await agent.start_mcp_server()
+        
+        # 各公司并发搜索和爬取，验证请求合并为一批发出
+        results = await agent.direct_verify_companies(
+            companies, max_concurrency, use_cache=use_cache, refresh=refresh
+        )
+        
+        # 打印结果摘要
+        print("\n=== 批量验证结果摘要 ===")
+        success_count = 0
+        for (company_name, _), result in zip(companies, results):
+            if isinstance(result, Exception):
+                print(f"✗ {company_name}: 出错 - {result}")
+            elif result.get("success"):
+                success_count += 1
+                print(f"✓ {company_name}: {result.get('linkedin_url', 'N/A')}")
+            else:
+                print(f"✗ {company_name}: 未找到匹配的LinkedIn页面")
+        print(f"\n共 {len(companies)} 家公司，成功 {success_count} 家")
+        
+        # 详细信息
+        if verbose:
+            print("\n=== 详细结果 ===")
+            for (company_name, _), result in zip(companies, results):
+                if not isinstance(result, Exception):
+                    write_json(result)
+        
+        return success_count == len(companies)
+        
+    except Exception as e:
+        print(f"测试过程中出错: {e}")
         return False
+    finally:
+        # 关闭自己创建的Agent
+        if owns_agent:
+            await agent.close()
+
+async def test_assistant(company_name, verbose=False, agent=None):
+    """测试OpenAI Assistant的功能
     
-    agent = OpenAIAgentWithMCP(api_key=api_key)
+    传入agent时复用其助手、MCP服务器和OpenAI客户端，且不会关闭它。
+    """
+    print(f"=== 开始测试OpenAI Assistant: 公司名称 '{company_name}' ===")
+    
+    # 初始化Agent
+    owns_agent = agent is None
+    if owns_agent:
+        agent = create_agent()
+        if agent is None:
+            return False
     
     try:
         # 创建Assistant
@@ -89,18 +172,15 @@ async def test_assistant(company_name, verbose=False):
         
         # 发送请求
         print("向Assistant发送请求...")
-        await agent.send_message(f"你好，请帮我验证'{company_name}'公司的信息，看看它是什么类型的公司，总部在哪里。")
+        await agent.send_message(ASSISTANT_PROMPT_TEMPLATE.format(company=company_name))
         
-        # 运行线程
+        # 流式运行线程，回复边生成边输出
         print("等待Assistant处理...")
-        run = await agent.run_thread()
-        
-        # 获取回复
-        responses = await agent.get_assistant_responses()
-        
         print("\n=== Assistant回复 ===")
-        for i, response in enumerate(responses):
-            print(f"回复 {i+1}:\n{response}\n")
+        async for text in agent.stream_response_text():
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        print("\n")
             
         return True
         
@@ -108,29 +188,27 @@ async def test_assistant(company_name, verbose=False):
         print(f"测试过程中出错: {e}")
         return False
     finally:
-        # 关闭服务器连接
-        await agent.close()
+        # 关闭自己创建的Agent
+        if owns_agent:
+            await agent.close()
 
-async def interactive_test():
-    """交互式测试模式"""
+async def interactive_test(agent, use_cache=True):
+    """交互式测试模式，所有测试共用同一个Agent"""
     print("=== 商机通验证工具 交互式测试模式 ===")
     print("您可以输入公司名称进行搜索和验证，输入 'exit' 退出。")
     
-    # 初始化Agent
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        print("错误: 未设置OPENAI_API_KEY环境变量")
-        return False
-    
-    agent = OpenAIAgentWithMCP(api_key=api_key)
-    
+    warm_task = None
     try:
-        # 启动MCP服务器
+        # 启动MCP服务器，之后的每次测试都复用它
         await agent.start_mcp_server()
         
         while True:
+            # 等待用户输入期间在后台预热MCP服务器和OpenAI连接
+            if warm_task is None or warm_task.done():
+                warm_task = asyncio.create_task(agent.prime())
+            
             # 获取公司名称
-            company_name = input("\n请输入公司名称 (输入'exit'退出): ").strip()
+            company_name = (await ainput("\n请输入公司名称 (输入'exit'退出): ")).strip()
             if company_name.lower() in ['exit', 'quit', '退出']:
                 break
                 
@@ -138,36 +216,86 @@ async def interactive_test():
                 continue
                 
             # 获取官方网站（可选）
-            official_website = input("请输入官方网站 (可选，直接回车跳过): ").strip()
+            official_website = (await ainput("请输入官方网站 (可选，直接回车跳过): ")).strip()
             if not official_website:
                 official_website = None
                 
             # 显示详细信息？
-            verbose_input = input("是否显示详细结果? (y/n): ").strip().lower()
+            verbose_input = (await ainput("是否显示详细结果? (y/n): ")).strip().lower()
             verbose = verbose_input == 'y'
             
             # 选择测试方式
-            test_mode = input("选择测试方式: 1=直接工作流, 2=OpenAI Assistant (默认1): ").strip()
+            test_mode = (await ainput("选择测试方式: 1=直接工作流, 2=OpenAI Assistant (默认1): ")).strip()
             
             if test_mode == '2':
                 # 使用Assistant
-                await test_assistant(company_name, verbose)
+                await test_assistant(company_name, verbose, agent=agent)
             else:
                 # 使用工作流
-                await test_workflow(company_name, official_website, verbose)
+                await test_workflow(company_name, official_website, verbose, agent=agent, use_cache=use_cache)
                 
     except Exception as e:
         print(f"测试过程中出错: {e}")
     finally:
-        # 关闭服务器连接
-        await agent.close()
+        if warm_task is not None:
+            warm_task.cancel()
+
+# 当前任务的输出缓冲区，为None时直接输出到原始stdout
+_task_output = contextvars.ContextVar("_task_output", default=None)
+
+class _TaskStdout:
+    """按任务分流的stdout：设置了缓冲区的任务写入自己的缓冲区，其他输出照常写出"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        return (_task_output.get() or self._stream).write(text)
+    
+    def flush(self):
+        if _task_output.get() is None:
+            self._stream.flush()
+    
+    @property
+    def buffer(self):
+        # 缓冲中的任务没有二进制缓冲区，write_json会改用文本写入
+        if _task_output.get() is not None:
+            return None
+        return self._stream.buffer
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+async def _run_buffered(coro):
+    """运行协程并收集它的全部输出，返回 (结果, 输出文本)"""
+    # gather为每个协程创建独立的任务和上下文，这里的设置只影响当前任务
+    buffer = io.StringIO()
+    _task_output.set(buffer)
+    try:
+        return await coro, buffer.getvalue()
+    finally:
+        _task_output.set(None)
+
+async def run_concurrently(*coros):
+    """并发运行多个测试，各自的输出缓冲后按顺序整段打印，避免交错"""
+    original_stdout = sys.stdout
+    sys.stdout = _TaskStdout(original_stdout)
+    try:
+        outcomes = await asyncio.gather(*[_run_buffered(coro) for coro in coros])
+    finally:
+        sys.stdout = original_stdout
+    
+    for _, output in outcomes:
+        sys.stdout.write(output)
+    sys.stdout.flush()
+    return [result for result, _ in outcomes]
 
 def parse_args():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description="商机通MCP服务器测试工具")
     
-    # 互斥参数组，只能使用其中一种模式
-    mode_group = parser.add_mutually_exclusive_group()
+    # 测试模式：-w和-a可同时指定并发执行，-i不能与它们同时使用
+    mode_group = parser.add_argument_group('测试模式')
     mode_group.add_argument('-i', '--interactive', action='store_true', 
                           help='交互式测试模式')
     mode_group.add_argument('-w', '--workflow', action='store_true', 
@@ -176,48 +304,103 @@ def parse_args():
                           help='测试OpenAI Assistant')
     
     # 其他参数
-    parser.add_argument('-c', '--company', type=str, 
-                       help='公司名称')
+    parser.add_argument('-c', '--company', type=str, action='append',
+                       help='公司名称，可重复指定多个公司进行批量测试')
+    parser.add_argument('-f', '--companies-file', type=str,
+                       help='公司列表文件，每行一个公司，可用制表符分隔附加官方网站')
     parser.add_argument('-o', '--official-website', type=str, 
-                       help='公司官方网站')
+                       help='公司官方网站（仅测试单个公司时使用）')
+    parser.add_argument('-j', '--max-concurrency', type=int, default=4,
+                       help='批量测试时的最大并发数 (默认4)')
     parser.add_argument('-v', '--verbose', action='store_true', 
                        help='显示详细信息')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用验证结果缓存，每次都重新验证')
+    parser.add_argument('--refresh', action='store_true',
+                       help='忽略已缓存的验证结果重新验证，并更新缓存')
+    
+    args = parser.parse_args()
+    if args.interactive and (args.workflow or args.assistant):
+        parser.error("-i/--interactive 不能与 -w/--workflow 或 -a/--assistant 同时使用")
+    if args.official_website and len(args.company or []) > 1:
+        parser.error("-o/--official-website 只能与单个 -c/--company 一起使用，多个公司请在公司列表文件中分别指定官方网站")
+    return args
+
+def load_companies(args):
+    """汇总命令行和文件中指定的公司，返回 (公司名称, 官方网站或None) 列表"""
+    companies = []
+    for company_name in args.company or []:
+        companies.append((company_name, args.official_website))
+    
+    if args.companies_file:
+        with open(args.companies_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                company_name, _, official_website = line.partition('\t')
+                companies.append((company_name.strip(), official_website.strip() or None))
     
-    return parser.parse_args()
+    return companies
 
 async def main():
     """主函数"""
     # 解析命令行参数
     args = parse_args()
+    companies = load_companies(args)
     
-    # 交互式模式
-    if args.interactive:
-        await interactive_test()
+    # 整个进程共用一个Agent，只在退出前关闭
+    agent = create_agent()
+    if agent is None:
         return
-        
-    # 测试工作流
-    if args.workflow:
-        if not args.company:
-            print("错误: 使用工作流测试模式时，必须指定公司名称 (-c/--company)")
+    
+    try:
+        # 交互式模式
+        if args.interactive:
+            await interactive_test(agent, use_cache=not args.no_cache)
             return
-        await test_workflow(args.company, args.official_website, args.verbose)
-        return
+            
+        tests = []
         
-    # 测试Assistant
-    if args.assistant:
-        if not args.company:
-            print("错误: 使用Assistant测试模式时，必须指定公司名称 (-c/--company)")
-            return
-        await test_assistant(args.company, args.verbose)
-        return
+        # 测试工作流
+        if args.workflow:
+            if not companies:
+                print("错误: 使用工作流测试模式时，必须指定公司名称 (-c/--company 或 -f/--companies-file)")
+                return
+            if len(companies) > 1:
+                tests.append(test_workflow_batch(companies, args.max_concurrency, args.verbose, agent=agent,
+                                                 use_cache=not args.no_cache, refresh=args.refresh))
+            else:
+                company_name, official_website = companies[0]
+                tests.append(test_workflow(company_name, official_website, args.verbose, agent=agent,
+                                           use_cache=not args.no_cache, refresh=args.refresh))
+            
+        # 测试Assistant
+        if args.assistant:
+            if not companies:
+                print("错误: 使用Assistant测试模式时，必须指定公司名称 (-c/--company)")
+                return
+            tests.append(test_assistant(companies[0][0], args.verbose, agent=agent))
         
-    # 如果没有指定任何模式，默认进入交互式模式
-    await interactive_test()
+        if len(tests) > 1:
+            # 同时指定-w和-a时并发执行，两者的OpenAI等待时间相互重叠
+            await run_concurrently(*tests)
+            return
+        if tests:
+            await tests[0]
+            return
+            
+        # 如果没有指定任何模式，默认进入交互式模式
+        await interactive_test(agent, use_cache=not args.no_cache)
+    finally:
+        # 关闭服务器连接
+        await agent.close()
 
 if __name__ == "__main__":
     # 确保正确加载dotenv
-    if not os.environ.get("OPENAI_API_KEY"):
+    if not API_KEY:
         print("警告: 未检测到OPENAI_API_KEY环境变量")
         print("请确保.env文件存在并包含必要的API密钥")
     
+    install_event_loop_policy()
     asyncio.run(main()) 
\ No newline at end of file